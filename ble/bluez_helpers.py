@@ -6,12 +6,86 @@ DBUS_OM_IFACE = "org.freedesktop.DBus.ObjectManager"
 LE_ADVERTISING_MANAGER_IFACE = "org.bluez.LEAdvertisingManager1"
 GATT_MANAGER_IFACE = "org.bluez.GattManager1"
 
+# Adapter path found by the last GetManagedObjects scan. Kept up to date by
+# the InterfacesAdded/InterfacesRemoved handlers below.
+_adapter_cache = {}
+_subscribed = False
+
+# dbus.Interface proxies keyed by (adapter path, interface)
+_managers = {}
+
+
+def _is_ble_adapter(ifaces):
+    return LE_ADVERTISING_MANAGER_IFACE in ifaces and GATT_MANAGER_IFACE in ifaces
+
+
+def _on_iface_added(path, ifaces):
+    if _is_ble_adapter(ifaces):
+        _adapter_cache["path"] = path
+
+
+def _on_iface_removed(path, ifaces):
+    if (LE_ADVERTISING_MANAGER_IFACE in ifaces or GATT_MANAGER_IFACE in ifaces) \
+            and _adapter_cache.get("path") == path:
+        _adapter_cache.pop("path", None)
+        for key in [k for k in _managers if k[0] == path]:
+            del _managers[key]
+
+
+def _subscribe(bus):
+    global _subscribed
+    if _subscribed:
+        return
+    bus.add_signal_receiver(
+        _on_iface_added,
+        dbus_interface=DBUS_OM_IFACE,
+        signal_name="InterfacesAdded",
+        bus_name=BLUEZ_SERVICE_NAME,
+    )
+    bus.add_signal_receiver(
+        _on_iface_removed,
+        dbus_interface=DBUS_OM_IFACE,
+        signal_name="InterfacesRemoved",
+        bus_name=BLUEZ_SERVICE_NAME,
+    )
+    _subscribed = True
+
+
 def find_adapter(bus):
-    """Return the D-Bus path of the first BLE adapter with both GATT and LE Advertising managers."""
+    """Return the D-Bus path of the first BLE adapter with both GATT and LE Advertising managers.
+
+    GetManagedObjects is expensive, so the result is cached and only
+    rescanned after the adapter disappears.
+    """
+    path = _adapter_cache.get("path")
+    if path is not None:
+        return path
+
     om = dbus.Interface(bus.get_object(BLUEZ_SERVICE_NAME, "/"), DBUS_OM_IFACE)
     objects = om.GetManagedObjects()
+    _subscribe(bus)
     for path, ifaces in objects.items():
-        if (LE_ADVERTISING_MANAGER_IFACE in ifaces and
-                GATT_MANAGER_IFACE in ifaces):
+        if _is_ble_adapter(ifaces):
+            _adapter_cache["path"] = path
             return path
-    return None
\ No newline at end of file
+    return None
+
+
+def _get_manager(bus, adapter_path, iface):
+    key = (adapter_path, iface)
+    manager = _managers.get(key)
+    if manager is None:
+        manager = dbus.Interface(
+            bus.get_object(BLUEZ_SERVICE_NAME, adapter_path), iface)
+        _managers[key] = manager
+    return manager
+
+
+def get_service_manager(bus, adapter_path):
+    """Return the (cached) GattManager1 interface of the adapter."""
+    return _get_manager(bus, adapter_path, GATT_MANAGER_IFACE)
+
+
+def get_ad_manager(bus, adapter_path):
+    """Return the (cached) LEAdvertisingManager1 interface of the adapter."""
+    return _get_manager(bus, adapter_path, LE_ADVERTISING_MANAGER_IFACE)
@@ -1,12 +1,21 @@
 # command_processor.py
+import os
+import sys
 import threading
 import queue
 import time
+from collections import deque
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, Any, Callable
 import traceback
 
+from config import COMMAND_THREAD_CPU, COMMAND_THREAD_NICE
+
+
+# dataclass(slots=True) needs Python 3.10+; Raspberry Pi OS bullseye ships 3.9
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
 
 class CommandType(Enum):
     """All possible command types"""
@@ -17,22 +26,21 @@ class CommandType(Enum):
     SAVE_SETTINGS = "save_settings"
 
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class Command:
     """Immutable command object"""
     type: CommandType
     params: dict[str, Any]
     response_queue: Optional[queue.Queue] = None
-    timestamp: float = time.time()
+    timestamp: float = field(default_factory=time.monotonic)
 
 
+@dataclass(**_SLOTS)
 class CommandResult:
     """Command execution result"""
-
-    def __init__(self, success: bool, message: str = "", data: Any = None):
-        self.success = success
-        self.message = message
-        self.data = data
+    success: bool
+    message: str = ""
+    data: Any = None
 
 
 class CommandProcessor:
@@ -41,10 +49,17 @@ class CommandProcessor:
     in a single thread with a queue-based architecture.
     """
 
+    # Command types where only the latest pending command matters
+    _COALESCABLE = (CommandType.SET_CURRENT, CommandType.SET_AIN_MODE)
+
     def __init__(self, pam_controller, state):
         self.pam = pam_controller
         self.state = state
-        self.command_queue = queue.Queue(maxsize=50)
+        # Single consumer: deque append/popleft are atomic, the event only
+        # wakes the processing thread
+        self._cmds = deque()
+        self._max_pending = 50
+        self._wake = threading.Event()
         self.running = True
 
         # Start processing thread
@@ -65,63 +80,111 @@ class CommandProcessor:
         Returns:
             CommandResult if wait_for_response=True, else None
         """
+        # Status only reads state, no need to go through the hardware queue
+        if cmd_type is CommandType.GET_STATUS:
+            return CommandResult(True, "Status retrieved", self.state.get_all())
+
+        if len(self._cmds) >= self._max_pending:
+            return CommandResult(False, "Command queue full")
+
         response_queue = queue.Queue() if wait_for_response else None
         cmd = Command(cmd_type, params, response_queue)
 
-        try:
-            self.command_queue.put(cmd, block=False)
-
-            if wait_for_response:
-                try:
-                    result = response_queue.get(timeout=5.0)
-                    return result
-                except queue.Empty:
-                    return CommandResult(False, "Command timeout")
+        self._cmds.append(cmd)
+        self._wake.set()
 
-            return CommandResult(True, "Command queued")
+        if wait_for_response:
+            try:
+                result = response_queue.get(timeout=5.0)
+                return result
+            except queue.Empty:
+                return CommandResult(False, "Command timeout")
 
-        except queue.Full:
-            return CommandResult(False, "Command queue full")
+        return CommandResult(True, "Command queued")
 
     def stop(self):
         """Stop the processor"""
         self.running = False
+        self._wake.set()
+
+    def _tune_thread(self):
+        """Pin the processing thread to one core and raise its priority (Linux only)."""
+        try:
+            if COMMAND_THREAD_CPU is not None and hasattr(os, "sched_setaffinity"):
+                if COMMAND_THREAD_CPU in os.sched_getaffinity(0):
+                    os.sched_setaffinity(0, {COMMAND_THREAD_CPU})
+            if COMMAND_THREAD_NICE and hasattr(os, "nice"):
+                os.nice(COMMAND_THREAD_NICE)
+        except OSError as e:
+            print(f"⚠️ Command processor thread tuning skipped: {e}")
 
     def _process_loop(self):
         """Main processing loop - runs in dedicated thread"""
+        self._tune_thread()
+
         while self.running:
             try:
-                # Get next command (with timeout to allow checking running flag)
-                cmd = self.command_queue.get(timeout=0.5)
+                # Wait for work (with timeout to allow checking running flag)
+                self._wake.wait(0.5)
+                self._wake.clear()
 
-                # Process the command
-                result = self._execute_command(cmd)
+                # Take everything queued so far in one burst, then execute
+                batch = self._coalesce(self._drain())
 
-                # Send response if requested
-                if cmd.response_queue:
-                    cmd.response_queue.put(result)
+                for cmd in batch:
+                    # Process the command
+                    result = self._execute_command(cmd)
+
+                    # Send response if requested
+                    if cmd.response_queue:
+                        cmd.response_queue.put(result)
 
-            except queue.Empty:
-                # No commands, continue
-                continue
             except Exception as e:
                 print(f"❌ Command processor error: {e}")
                 traceback.print_exc()
 
+    def _drain(self) -> list[Command]:
+        """Pop all currently pending commands, oldest first."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._cmds.popleft())
+            except IndexError:
+                return batch
+
+    def _coalesce(self, batch: list[Command]) -> list[Command]:
+        """
+        Drop SET_CURRENT / SET_AIN_MODE commands superseded by a later one
+        for the same channel and mode (e.g. slider spam), keeping the last.
+        Any other command type is a barrier and is never reordered.
+        """
+        kept = []
+        latest = {}
+        for cmd in batch:
+            if cmd.type not in self._COALESCABLE:
+                latest.clear()
+                kept.append(cmd)
+                continue
+
+            key = (cmd.type, cmd.params.get('channel'), cmd.params.get('mode'))
+            idx = latest.get(key)
+            if idx is not None:
+                dropped = kept[idx]
+                kept[idx] = None
+                if dropped.response_queue:
+                    dropped.response_queue.put(
+                        CommandResult(True, "Coalesced"))
+            latest[key] = len(kept)
+            kept.append(cmd)
+
+        return [cmd for cmd in kept if cmd is not None]
+
     def _execute_command(self, cmd: Command) -> CommandResult:
         """Execute a single command"""
         try:
-            handlers = {
-                CommandType.CHANGE_MODE: self._handle_change_mode,
-                CommandType.SET_AIN_MODE: self._handle_set_ain_mode,
-                CommandType.SET_CURRENT: self._handle_set_current,
-                CommandType.SAVE_SETTINGS: self._handle_save_settings,
-                CommandType.GET_STATUS: self._handle_get_status,
-            }
-
-            handler = handlers.get(cmd.type)
+            handler = self._HANDLERS.get(cmd.type)
             if handler:
-                return handler(cmd)
+                return handler(self, cmd)
             else:
                 return CommandResult(False, f"Unknown command type: {cmd.type}")
 
@@ -156,15 +219,16 @@ class CommandProcessor:
                     # Set both channels to the same mode
                     print(f"📌 Setting AINA to {current_mode}")
                     self.pam.write_ain_mode(current_mode, 'A')
-                    time.sleep(0.1)
+                    if not self.pam.wait_ain_mode(current_mode, 'A'):
+                        print(f"⚠️ AINA did not read back as {current_mode}")
 
                     print(f"📌 Setting AINB to {current_mode}")
                     self.pam.write_ain_mode(current_mode, 'B')
-                    time.sleep(0.1)
+                    if not self.pam.wait_ain_mode(current_mode, 'B'):
+                        print(f"⚠️ AINB did not read back as {current_mode}")
 
-                    # Save settings
+                    # Save settings, waits for the EEPROM write to finish
                     self.pam.save_pam_settings()
-                    time.sleep(0.5)  # Wait for EEPROM
 
                     # Verify both are set
                     new_mode_a = self.pam.read_ain_mode('A')
@@ -287,7 +351,8 @@ class CommandProcessor:
     def _handle_save_settings(self, cmd: Command) -> CommandResult:
         """Save settings to EEPROM"""
         try:
-            self.pam.save_pam_settings()
+            if not self.pam.save_pam_settings():
+                return CommandResult(False, "Save not confirmed by PAM")
             return CommandResult(True, "Settings saved")
         except Exception as e:
             return CommandResult(False, f"Save failed: {e}")
@@ -299,3 +364,12 @@ class CommandProcessor:
             return CommandResult(True, "Status retrieved", data)
         except Exception as e:
             return CommandResult(False, f"Status error: {e}")
+
+    # Dispatch table, built once when the class is created
+    _HANDLERS = {
+        CommandType.CHANGE_MODE: _handle_change_mode,
+        CommandType.SET_AIN_MODE: _handle_set_ain_mode,
+        CommandType.SET_CURRENT: _handle_set_current,
+        CommandType.SAVE_SETTINGS: _handle_save_settings,
+        CommandType.GET_STATUS: _handle_get_status,
+    }
@@ -1,17 +1,17 @@
 # ble/gatt_server.py
 import dbus
 import dbus.service
-import threading
 import time
 import os
+import re
 from gi.repository import GLib
 from dbus.mainloop.glib import DBusGMainLoop
 
 from config import SERVICE_UUID, CHAR_UUID, BLE_DEVICE_NAME
 from ble.bluez_helpers import (
     find_adapter,
-    GATT_MANAGER_IFACE,
-    LE_ADVERTISING_MANAGER_IFACE,
+    get_ad_manager,
+    get_service_manager,
 )
 from ble.command_processor import CommandType
 
@@ -22,6 +22,58 @@ LE_ADVERTISEMENT_IFACE = "org.bluez.LEAdvertisement1"
 PROP_IFACE = "org.freedesktop.DBus.Properties"
 DBUS_OM_IFACE = "org.freedesktop.DBus.ObjectManager"
 
+# Resend an unchanged state packet at least this often (seconds)
+NOTIFY_KEEPALIVE = 1.0
+# State changes are pushed at most this often (seconds)
+NOTIFY_MIN_INTERVAL = 0.2
+
+# BlueZ Register* calls: per-call timeout and retry backoff (seconds)
+REGISTER_TIMEOUT = 5.0
+REGISTER_MAX_ATTEMPTS = 5
+REGISTER_RETRY_DELAY = 1.0
+REGISTER_RETRY_MAX_DELAY = 16.0
+
+# State packet sent to BLE clients: "FUNC:<v>,WA:<v>,...,CURRENT_STATUS:<v>\n"
+_PACKET_FIELDS = (
+    "FUNC",
+    "WA",
+    "WB",
+    "IA",
+    "IB",
+    "MODE",
+    "READY",
+    "PIN15",
+    "PIN6",
+    "ENABLED_B",
+    "CURRENT_A_STATUS",
+    "CURRENT_B_STATUS",
+    "CURRENT_STATUS",
+)
+# Bound str.format of the template, takes the values positionally in
+# _PACKET_FIELDS order (see MachineState.get_values)
+_format_packet = (
+    ",".join(f"{name}:{{}}" for name in _PACKET_FIELDS) + "\n"
+).format
+
+# BLE text commands that map directly to a command and fixed params
+_SIMPLE_COMMANDS = {
+    "195": (CommandType.CHANGE_MODE, {"mode": 195}),
+    "196": (CommandType.CHANGE_MODE, {"mode": 196}),
+    "VOLTAGE": (CommandType.SET_AIN_MODE, {"unit": "V"}),
+    "CURRENT": (CommandType.SET_AIN_MODE, {"unit": "C"}),
+}
+
+# PREFIX:VALUE:MODE current-setting commands; like int(), the numbers may
+# carry a sign and surrounding whitespace ("CUR: +1500 :195")
+_CURRENT_RE = re.compile(r"([A-Z]+):\s*([+-]?\d+)\s*:\s*([+-]?\d+)\s*")
+
+# Current-setting prefixes -> (channel, required PAM function)
+_CURRENT_COMMANDS = {
+    "CUR": ("A", 195),   # Mode 195 always uses channel A
+    "CURA": ("A", 196),
+    "CURB": ("B", 196),
+}
+
 # -------------------------------------------------
 # GATT Application, Service, Characteristic
 # -------------------------------------------------
@@ -30,11 +82,12 @@ DBUS_OM_IFACE = "org.freedesktop.DBus.ObjectManager"
 class Application(dbus.service.Object):
     def __init__(self, bus):
         self.path = "/"
+        self._object_path = dbus.ObjectPath(self.path)
         self.services = []
         dbus.service.Object.__init__(self, bus, self.path)
 
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return self._object_path
 
     def add_service(self, service):
         self.services.append(service)
@@ -52,107 +105,76 @@ class Application(dbus.service.Object):
 class Service(dbus.service.Object):
     def __init__(self, bus, index, uuid, primary=True):
         self.path = f"/com/example/service{index}"
+        self._object_path = dbus.ObjectPath(self.path)
         self.bus = bus
         self.uuid = uuid
         self.primary = primary
         self.characteristics = []
+        # Properties never change after construction, so build the typed
+        # D-Bus dicts once and reuse them for GetAll/GetManagedObjects
+        self._props = {
+            GATT_SERVICE_IFACE: dbus.Dictionary({
+                "UUID": self.uuid,
+                "Primary": self.primary,
+            }, signature="sv")
+        }
         dbus.service.Object.__init__(self, bus, self.path)
 
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return self._object_path
 
     def add_characteristic(self, chrc):
         self.characteristics.append(chrc)
 
     def get_properties(self):
-        return {
-            GATT_SERVICE_IFACE: {
-                "UUID": self.uuid,
-                "Primary": self.primary,
-            }
-        }
+        return self._props
 
 
 class Characteristic(dbus.service.Object):
     def __init__(self, bus, index, uuid, flags, service, cmd_processor):
         self.path = service.path + f"/char{index}"
+        self._object_path = dbus.ObjectPath(self.path)
         self.cmd_processor = cmd_processor
         self.bus = bus
         self.uuid = uuid
         self.flags = flags
         self.service = service
         self.notifying = False
-        self.value = [dbus.Byte(0)]
+        # Last notified packet; unchanged packets are only resent as a keepalive
+        self._last_packet = None
+        self._last_flush = 0.0
+        # Raw value bytes; the dbus.Array is only built when someone needs it
+        self._raw = b"\x00"
+        self._value_arr = None
+        self._props = {
+            GATT_CHRC_IFACE: dbus.Dictionary({
+                "Service": self.service.get_path(),
+                "UUID": self.uuid,
+                "Flags": dbus.Array(self.flags, signature="s"),
+            }, signature="sv")
+        }
         dbus.service.Object.__init__(self, bus, self.path)
 
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return self._object_path
 
     def get_properties(self):
-        return {
-            GATT_CHRC_IFACE: {
-                "Service": self.service.get_path(),
-                "UUID": self.uuid,
-                "Flags": self.flags,
-            }
-        }
+        return self._props
+
+    def _value_array(self):
+        """Return the current value as a D-Bus byte array, built on demand."""
+        if self._value_arr is None:
+            self._value_arr = dbus.Array(self._raw, signature="y")
+        return self._value_arr
 
     def _notify_value(self, text: str):
+        """Store text as the characteristic value and notify subscribers."""
+        self._raw = text.encode("utf-8")
+        self._value_arr = None
         if not self.notifying:
             return
-        data = [dbus.Byte(b) for b in text.encode("utf-8")]
-        self.PropertiesChanged(GATT_CHRC_IFACE, {"Value": data}, [])
-
-    def _process_ain_command(self, mode_type, target_mode):
-        """Helper method to process AIN commands"""
-        try:
-            channel = None
-
-            if target_mode == 195:
-                # Mode 195: Only A channel available
-                channel = "A"
-                print(f"📌 Mode 195: Setting AIN A to {mode_type}")
-
-            elif target_mode == 196:
-                # Mode 196: Both channels available
-                # Track last channel used
-                if not hasattr(self, "last_ain_channel"):
-                    self.last_ain_channel = "A"  # Default to A first
-
-                # Toggle between A and B
-                channel = self.last_ain_channel
-                self.last_ain_channel = "B" if self.last_ain_channel == "A" else "A"
-                print(f"📌 Mode 196: Setting AIN {channel} to {mode_type}")
-
-            else:
-                print(f"❌ Unknown target mode: {target_mode}")
-                return
-
-            # Set lock for AIN command
-            self.write_lock.set()
-
-            def execute_ain_command():
-                try:
-                    if channel is None:
-                        print("❌ No channel assigned for this mode")
-                        return
-
-                    success = self.pam_controller.change_pam_ain_mode(
-                        mode_type[0], channel
-                    )
-                    result = f"AIN{channel} set to {mode_type[0]}: {'✅ SUCCESS' if success else '❌ FAILED'}"
-                    print(f"✅ {result}")
-
-                except Exception as e:
-                    print(f"❌ AIN command execution error: {e}")
-                finally:
-                    self.write_lock.clear()
-
-            threading.Thread(target=execute_ain_command, daemon=True).start()
-
-        except Exception as e:
-            print(f"❌ Error in _process_ain_command: {e}")
-            self.write_lock.clear()
+        self.PropertiesChanged(
+            GATT_CHRC_IFACE, {"Value": self._value_array()}, [])
 
     def _parse_command(self, received: str):
         """
@@ -162,69 +184,27 @@ class Characteristic(dbus.service.Object):
         received = received.strip().upper()
 
         # Simple direct commands
-        if received == "195":
-            return CommandType.CHANGE_MODE, {"mode": 195}
-
-        elif received == "196":
-            return CommandType.CHANGE_MODE, {"mode": 196}
-
-        elif received == "VOLTAGE":
-            return CommandType.SET_AIN_MODE, {"unit": "V"}
-
-        elif received == "CURRENT":
-            return CommandType.SET_AIN_MODE, {"unit": "C"}
-
-        # Mode 195 format: CUR:1500:195
-        if (
-            received.startswith("CUR:")
-            and not received.startswith("CURA:")
-            and not received.startswith("CURB:")
-        ):
-            # Format: CUR:1500:195
-            parts = received.split(":")
-            if len(parts) == 3:
-                _, value, mode = parts
-                # Validate mode is 195
-                if int(mode) == 195:
-                    return CommandType.SET_CURRENT, {
-                        "channel": "A",  # Mode 195 always uses channel A
-                        "mode": int(mode),
-                        "value": int(value),
-                    }
-                else:
-                    print(f"❌ Invalid mode {mode} for CUR: format (expected 195)")
-                    return None, None
-
-        # Mode 196 format: CURA:1600:196
-        elif received.startswith("CURA:"):
-            parts = received.split(":")
-            if len(parts) == 3:
-                _, value, mode = parts
-                # Validate mode is 196
-                if int(mode) == 196:
-                    return CommandType.SET_CURRENT, {
-                        "channel": "A",
-                        "mode": int(mode),
-                        "value": int(value),
-                    }
-                else:
-                    print(f"❌ Invalid mode {mode} for CURA: format (expected 196)")
-                    return None, None
-
-        # Mode 196 format: CURB:1200:196
-        elif received.startswith("CURB:"):
-            parts = received.split(":")
-            if len(parts) == 3:
-                _, value, mode = parts
-                # Validate mode is 196
-                if int(mode) == 196:
+        simple = _SIMPLE_COMMANDS.get(received)
+        if simple:
+            cmd_type, params = simple
+            return cmd_type, dict(params)
+
+        # Current formats: CUR:1500:195, CURA:1600:196, CURB:1200:196
+        match = _CURRENT_RE.fullmatch(received)
+        if match:
+            prefix, value, mode = match.groups()
+            target = _CURRENT_COMMANDS.get(prefix)
+            if target:
+                channel, expected_mode = target
+                if int(mode) == expected_mode:
                     return CommandType.SET_CURRENT, {
-                        "channel": "B",
+                        "channel": channel,
                         "mode": int(mode),
                         "value": int(value),
                     }
                 else:
-                    print(f"❌ Invalid mode {mode} for CURB: format (expected 196)")
+                    print(
+                        f"❌ Invalid mode {mode} for {prefix}: format (expected {expected_mode})")
                     return None, None
 
         return None, None
@@ -232,6 +212,9 @@ class Characteristic(dbus.service.Object):
     @dbus.service.method(GATT_CHRC_IFACE)
     def StartNotify(self):
         self.notifying = True
+        # Send the full state to the new subscriber on the next keepalive check
+        self._last_packet = None
+        self._last_flush = 0.0
 
     @dbus.service.method(GATT_CHRC_IFACE)
     def StopNotify(self):
@@ -263,14 +246,16 @@ class Characteristic(dbus.service.Object):
 
     @dbus.service.method(GATT_CHRC_IFACE, in_signature="a{sv}", out_signature="ay")
     def ReadValue(self, options):
-        return dbus.Array(self.value, signature="y")
+        return self._value_array()
 
     @dbus.service.method(GATT_CHRC_IFACE, in_signature="aya{sv}")
     def WriteValue(self, value, options):
         """Handle write requests - now much simpler"""
         try:
-            # Convert bytes to string
-            received = bytes(value).decode("utf-8").strip()
+            # Convert bytes to string (commands are plain ASCII)
+            received = bytes(value).decode("ascii", "ignore").strip()
+            if not received:
+                return
             print(f"📱 BLE Received: '{received}'")
 
             # Parse command
@@ -306,36 +291,66 @@ class DataCharacteristic(Characteristic):
         self.state = state  # MachineState instance
         self.pam_controller = pam_controller
         self.write_lock = write_lock
+        # A push is scheduled on the GLib loop and hasn't run yet
+        self._push_pending = False
+
+    def _value_array(self):
+        # Without subscribers nothing pushes new values, so every ReadValue
+        # formats a fresh packet from the current state (no caching here;
+        # reads without a subscription are rare)
+        if not self.notifying:
+            values = self.state.get_values(_PACKET_FIELDS)
+            self._raw = _format_packet(*values).encode("utf-8")
+            self._value_arr = None
+        return super()._value_array()
 
     def start_sending(self):
-        """Background thread: read state and notify every 0.2s."""
-
-        def loop():
-            while True:
-                try:
-                    data = self.state.get_all()
-                    packet = (
-                        f"FUNC:{data['FUNC']},"
-                        f"WA:{data['WA']},"
-                        f"WB:{data['WB']},"
-                        f"IA:{data['IA']},"
-                        f"IB:{data['IB']},"
-                        f"MODE:{data['MODE']},"
-                        f"READY:{data['READY']},"
-                        f"PIN15:{data['PIN15']},"
-                        f"PIN6:{data['PIN6']},"
-                        f"ENABLED_B:{data['ENABLED_B']},"
-                        f"CURRENT_A_STATUS:{data['CURRENT_A_STATUS']},"
-                        f"CURRENT_B_STATUS:{data['CURRENT_B_STATUS']},"
-                        f"CURRENT_STATUS:{data['CURRENT_STATUS']}\n"
-                    )
-                    self.value = [dbus.Byte(b) for b in packet.encode("utf-8")]
-                    self._notify_value(packet)
-                except Exception as e:
-                    print("BLE notification error:", e)
-                time.sleep(0.2)
-
-        threading.Thread(target=loop, daemon=True).start()
+        """
+        Notify the machine state when it changes (at most every
+        NOTIFY_MIN_INTERVAL), plus a keepalive when nothing was sent for
+        NOTIFY_KEEPALIVE.
+        """
+        self.state.add_listener(self._on_state_changed)
+        GLib.timeout_add(250, self._keepalive)
+
+    def _on_state_changed(self):
+        """MachineState listener, runs on the writer's thread: schedule a push."""
+        if self._push_pending or not self.notifying:
+            return
+        self._push_pending = True
+        GLib.idle_add(self._push)
+
+    def _push(self):
+        """Send the changed state, once NOTIFY_MIN_INTERVAL has passed."""
+        wait = NOTIFY_MIN_INTERVAL - (time.monotonic() - self._last_flush)
+        if wait > 0:
+            GLib.timeout_add(int(wait * 1000) + 1, self._push)
+            return False
+        self._push_pending = False
+        self._tick()
+        return False
+
+    def _keepalive(self):
+        """Resend the state if nothing went out lately. Keeps the timer armed."""
+        if self.notifying and time.monotonic() - self._last_flush >= NOTIFY_KEEPALIVE:
+            self._tick()
+        return True
+
+    def _tick(self):
+        """Build and send one state packet, unless unchanged and not due for a keepalive."""
+        if not self.notifying:
+            return True
+        try:
+            packet = _format_packet(*self.state.get_values(_PACKET_FIELDS))
+            now = time.monotonic()
+            if packet == self._last_packet and now - self._last_flush < NOTIFY_KEEPALIVE:
+                return True
+            self._notify_value(packet)
+            self._last_packet = packet
+            self._last_flush = now
+        except Exception as e:
+            print("BLE notification error:", e)
+        return True
 
 
 # -------------------------------------------------
@@ -344,6 +359,7 @@ class DataCharacteristic(Characteristic):
 class Advertisement(dbus.service.Object):
     def __init__(self, bus, index, adapter_path):
         self.path = f"/com/example/advertisement{index}"
+        self._object_path = dbus.ObjectPath(self.path)
         self.bus = bus
         self.adapter_path = adapter_path
         self.service_uuids = [SERVICE_UUID]
@@ -351,20 +367,20 @@ class Advertisement(dbus.service.Object):
         self.include_tx_power = True
         self.type = "peripheral"
         self.discoverable = False
+        self._props = {
+            LE_ADVERTISEMENT_IFACE: dbus.Dictionary({
+                "Type": dbus.String(self.type),
+                "ServiceUUIDs": dbus.Array(self.service_uuids, signature="s"),
+                "LocalName": self.local_name,
+            }, signature="sv")
+        }
         dbus.service.Object.__init__(self, bus, self.path)
 
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return self._object_path
 
     def get_properties(self):
-        properties = {
-            LE_ADVERTISEMENT_IFACE: {
-                "Type": dbus.String(self.type),
-                "ServiceUUIDs": dbus.Array(self.service_uuids, signature="s"),
-                "LocalName": self.local_name,
-            }
-        }
-        return properties
+        return self._props
 
     @dbus.service.method(PROP_IFACE, in_signature="s", out_signature="a{sv}")
     def GetAll(self, interface):
@@ -380,9 +396,7 @@ class Advertisement(dbus.service.Object):
 def unregister_old_advertisement(bus, adapter_path, adv_path):
     """Try to unregister an advertisement by path if it exists."""
     try:
-        ad_manager = dbus.Interface(
-            bus.get_object("org.bluez", adapter_path), LE_ADVERTISING_MANAGER_IFACE
-        )
+        ad_manager = get_ad_manager(bus, adapter_path)
         ad_manager.UnregisterAdvertisement(dbus.ObjectPath(adv_path))
         print(f"✅ Unregistered old advertisement: {adv_path}")
     except dbus.exceptions.DBusException as e:
@@ -393,6 +407,38 @@ def unregister_old_advertisement(bus, adapter_path, adv_path):
             print(f"⚠️ Failed to unregister {adv_path}: {e}")
 
 
+def _register_with_retry(register, obj_path, on_success, what, mainloop, attempt=0):
+    """Call a BlueZ Register* method without blocking the main loop.
+
+    The call is bounded by REGISTER_TIMEOUT; failures are retried with
+    exponential backoff and the main loop is stopped after
+    REGISTER_MAX_ATTEMPTS.
+    """
+    def on_error(e):
+        if "org.bluez.Error.AlreadyExists" in str(e):
+            # An earlier attempt that timed out went through after all
+            on_success()
+            return
+        if attempt + 1 >= REGISTER_MAX_ATTEMPTS:
+            print(f"❌ Failed to register {what}:", e)
+            mainloop.quit()
+            return
+        delay = min(REGISTER_RETRY_DELAY * 2 ** attempt, REGISTER_RETRY_MAX_DELAY)
+        print(f"⚠️ Failed to register {what} ({e}), retrying in {delay:.0f}s")
+        GLib.timeout_add(
+            int(delay * 1000), _register_with_retry,
+            register, obj_path, on_success, what, mainloop, attempt + 1
+        )
+
+    register(
+        obj_path, {},
+        reply_handler=on_success,
+        error_handler=on_error,
+        timeout=REGISTER_TIMEOUT,
+    )
+    return False  # one-shot when scheduled through GLib.timeout_add
+
+
 # -------------------------------------------------
 # Main entry: start BLE server in a GLib main loop thread
 # -------------------------------------------------
@@ -422,12 +468,8 @@ def run_ble_server(state, pam_controller, write_lock, cmd_processor):
     app.add_service(service)
 
     # Register GATT app
-    service_manager = dbus.Interface(
-        bus.get_object("org.bluez", adapter), GATT_MANAGER_IFACE
-    )
-    ad_manager = dbus.Interface(
-        bus.get_object("org.bluez", adapter), LE_ADVERTISING_MANAGER_IFACE
-    )
+    service_manager = get_service_manager(bus, adapter)
+    ad_manager = get_ad_manager(bus, adapter)
 
     adv = Advertisement(bus, 0, adapter)
 
@@ -437,23 +479,19 @@ def run_ble_server(state, pam_controller, write_lock, cmd_processor):
         print("✅ GATT application registered")
         ch.start_sending()
 
-    def on_app_error(e):
-        print("❌ Failed to register application:", e)
-        mainloop.quit()
-
     def on_adv_registered():
         print(f"✅ Advertisement registered: name={BLE_DEVICE_NAME}")
 
-    def on_adv_error(e):
-        print("❌ Failed to register advertisement:", e)
-        mainloop.quit()
-
-    service_manager.RegisterApplication(
-        app.get_path(), {}, reply_handler=on_app_registered, error_handler=on_app_error
+    # Both registrations are issued back-to-back without waiting for each
+    # other's reply; they complete concurrently and neither callback depends
+    # on the other having run.
+    _register_with_retry(
+        service_manager.RegisterApplication, app.get_path(),
+        on_app_registered, "application", mainloop
     )
-
-    ad_manager.RegisterAdvertisement(
-        adv.get_path(), {}, reply_handler=on_adv_registered, error_handler=on_adv_error
+    _register_with_retry(
+        ad_manager.RegisterAdvertisement, adv.get_path(),
+        on_adv_registered, "advertisement", mainloop
     )
 
     try:
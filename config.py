@@ -15,7 +15,13 @@ DWIN_BAUD = 115200
 # Timing
 PAM_CMD_DELAY = 0.0
 MAIN_LOOP_DELAY = 0.005
-MODE_CHECK_INTERVAL = 3.0
+TRANSITION_WAIT_TIMEOUT = 3.0  # longest main-loop wait on a mode transition
+SETTINGS_POLL_INTERVAL = 1.0   # FUNCTION / AIN modes, measurements every pass
+
+# Command processor thread: CPU to pin to (None = no pinning) and niceness
+# (negative values need root). Core 0 handles IRQs/BlueZ on the Pi.
+COMMAND_THREAD_CPU = 1
+COMMAND_THREAD_NICE = -5
 
 # BLE UUIDs (fixed)
 SERVICE_UUID = "12345678-1234-5678-1234-56789abcdef0"
@@ -1,8 +1,29 @@
 # hardware/dwin.py
 import time
+import struct
+from functools import lru_cache
 from config import DWIN_PORT, DWIN_BAUD, VPIN_WA, VPIN_WB, VPIN_IA, VPIN_IB, VPIN_TEMP, VPIN_MODE_ADDR
 from utils.serial_reconnect import SerialReconnect
 
+# 5A A5 05 82 <vpin> <int16> : write one VP variable
+_VP_WRITE = struct.Struct(">4BHh")
+_pack_vp_write_into = _VP_WRITE.pack_into
+_VP_WRITE_SIZE = _VP_WRITE.size
+# 5A A5 07 82 0084 5A 01 <page> : switch page (system register 0x84)
+_pack_page_switch = struct.Struct(">4BHBBH").pack
+# 5A A5 03 83 5100 : read VP 0x5100
+_READ_VP_5100 = bytes([0x5A, 0xA5, 0x03, 0x83, 0x51, 0x00])
+
+# Slot of each known VPIN in DWINDisplay._cache
+_VPIN_INDEX = {
+    VPIN_WA: 0,
+    VPIN_WB: 1,
+    VPIN_IA: 2,
+    VPIN_IB: 3,
+    VPIN_TEMP: 4,
+    VPIN_MODE_ADDR: 5,
+}
+
 
 class DWINDisplay:
     """Interface to the DWIN serial display."""
@@ -15,42 +36,76 @@ class DWINDisplay:
             write_timeout=0.2,
             name="DWIN"
         )
-        self._cache = {}
+        # Last value written per VPIN: list slots for known VPINs, dict for others
+        self._cache = [None] * len(_VPIN_INDEX)
+        self._extra_cache = {}
+        # Scratch buffer for outgoing VP writes, filled in place; room for
+        # one frame per known VPIN, grown if a caller ever sends more
+        self._tx_buf = bytearray(_VP_WRITE_SIZE * 8)
+        self._tx_view = memoryview(self._tx_buf)
 
     # ---------- low level write ----------
     def _write_packet(self, vpin, int_value):
         """Send a 5A A5 packet to set a variable address."""
-        packet = (
-            bytes([0x5A, 0xA5, 0x05, 0x82]) +
-            vpin.to_bytes(2, "big") +
-            int_value.to_bytes(2, "big", signed=True)
-        )
-        self.ser.write(packet)
+        _pack_vp_write_into(self._tx_buf, 0,
+                            0x5A, 0xA5, 0x05, 0x82, vpin, int_value)
+        self.ser.write(self._tx_view[:_VP_WRITE_SIZE])
 
     # ---------- public API ----------
+    def close(self):
+        """Close the DWIN serial port."""
+        self.ser.close()
+
+    def _changed(self, vpin, iv):
+        """Record iv as last sent for vpin; False if it was already sent."""
+        idx = _VPIN_INDEX.get(vpin)
+        if idx is None:
+            if self._extra_cache.get(vpin) == iv:
+                return False
+            self._extra_cache[vpin] = iv
+        else:
+            if self._cache[idx] == iv:
+                return False
+            self._cache[idx] = iv
+        return True
+
     def send_value(self, vpin, value):
         """Scale float to int16 and write if changed."""
         iv = int(round(value * 10))
         iv = max(-32768, min(32767, iv))
+        if self._changed(vpin, iv):
+            self._write_packet(vpin, iv)
 
-        if self._cache.get(vpin) == iv:
-            return
-        self._cache[vpin] = iv
-        self._write_packet(vpin, iv)
+    def send_values(self, items):
+        """
+        send_value() for several (vpin, value) pairs: the frames of the
+        changed ones go out back to back in a single serial write.
+        """
+        buf = self._tx_buf
+        end = 0
+        for vpin, value in items:
+            iv = max(-32768, min(32767, int(round(value * 10))))
+            if self._changed(vpin, iv):
+                if end + _VP_WRITE_SIZE > len(buf):
+                    self._tx_view.release()  # a viewed bytearray can't resize
+                    buf.extend(bytes(_VP_WRITE_SIZE))
+                    self._tx_view = memoryview(buf)
+                _pack_vp_write_into(buf, end,
+                                    0x5A, 0xA5, 0x05, 0x82, vpin, iv)
+                end += _VP_WRITE_SIZE
+        if end:
+            self.ser.write(self._tx_view[:end])
 
     def send_mode(self, mode):
-        """Send mode (V=0, C=1) to VPIN 0x5000."""
+        """Send mode (V=0, C=1) to VPIN 0x5000 if changed."""
         mode_val = 0 if mode == "V" else 1
-        self._write_packet(VPIN_MODE_ADDR, mode_val)
+        if self._changed(VPIN_MODE_ADDR, mode_val):
+            self._write_packet(VPIN_MODE_ADDR, mode_val)
 
     def switch_page(self, page_id):
         """Change to a given page ID."""
-        frame = bytes([
-            0x5A, 0xA5, 0x07, 0x82,
-            0x00, 0x84, 0x5A, 0x01,
-            (page_id >> 8) & 0xFF,
-            page_id & 0xFF
-        ])
+        frame = _pack_page_switch(
+            0x5A, 0xA5, 0x07, 0x82, 0x0084, 0x5A, 0x01, page_id & 0xFFFF)
         self.ser.write(frame)
         self.ser.flush()
         time.sleep(0.01)
@@ -59,32 +114,47 @@ class DWINDisplay:
 
     def read_vp_5100(self, timeout=2.0):
         """Poll VP5100 (water flow sensor) and return integer value."""
-        cmd = bytes([0x5A, 0xA5, 0x03, 0x83, 0x51, 0x00])
-        start = time.time()
-        buffer = b""
+        deadline = time.monotonic() + timeout
 
         self.ser.reset_input_buffer()
-        while time.time() - start < timeout:
-            self.ser.write(cmd)
-            t0 = time.time()
-            while time.time() - t0 < 0.15:
-                if self.ser.in_waiting:
-                    buffer += self.ser.read(self.ser.in_waiting)
-                    if len(buffer) >= 8:
-                        return (buffer[-2] << 8) | buffer[-1]
-                time.sleep(0.01)
+        send = True
+        while time.monotonic() < deadline:
+            if send:
+                self.ser.write(_READ_VP_5100)
+            # Reply: 5A A5 <len> 83 51 00 <count> <hi> <lo>. Each read blocks
+            # in pyserial (GIL released) until the bytes arrive or the port
+            # timeout expires.
+            header = self.ser.read(3)
+            if len(header) == 3 and header[0] == 0x5A and header[1] == 0xA5:
+                body = self.ser.read(header[2])
+                if len(body) == header[2]:
+                    if (len(body) >= 6 and body[0] == 0x83
+                            and body[1:3] == b"\x51\x00" and body[3] >= 1):
+                        return (body[4] << 8) | body[5]
+                    # Whole frame meant for something else (e.g. a late
+                    # 82 "OK" write ack), skip it and keep reading
+                    send = False
+                    continue
+            # Partial or garbled frame, drop it and ask again
+            self.ser.reset_input_buffer()
+            send = True
         return None
 
-    # ---------- scaling (specific to display) ----------
-    @staticmethod
-    def scale_value(raw, mode, function):
-        """Convert raw PAM value to display units."""
+
+# ---------- scaling (specific to display) ----------
+# Readings are stable most of the time, so the same (raw, mode, function)
+# repeats pass after pass
+@lru_cache(maxsize=256)
+def scale_value(raw, mode, function):
+    """Convert raw PAM value to display units."""
+    if type(raw) is not float:
         raw = float(raw)
-        if mode == "V":
-            return raw / 1000.0
-        if mode == "C":
-            if function == 196:
-                return (raw * 0.0016) + 4.0
-            # function 195 (or default)
-            return min(20.0, max(4.0, (raw * 0.0008) + 12.0))
-        return None
+    if mode == "V":
+        return raw / 1000.0
+    if mode == "C":
+        if function == 196:
+            return (raw * 0.0016) + 4.0
+        # function 195 (or default), clamped to 4..20 mA
+        v = (raw * 0.0008) + 12.0
+        return 4.0 if v < 4.0 else (20.0 if v > 20.0 else v)
+    return None
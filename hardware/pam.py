@@ -1,51 +1,258 @@
 # hardware/pam.py
-import time
+from time import monotonic as _monotonic, sleep as _sleep
+from threading import RLock
 from config import PAM_PORT, PAM_BAUD, PAM_CMD_DELAY
 from utils.serial_reconnect import SerialReconnect
 import re
 
+# A whitespace/prompt-delimited number token in a PAM reply, e.g. b"196" in
+# b"FUNCTION 196\r\n>" (but not the "1" in b"RX1:READYA")
+_NUM_RE = re.compile(rb"(?<![^\s>])[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?(?![^\s>])")
+
+# Pre-encoded polled queries
+_CMD_READYA = b"RX1:READYA\r\n"
+_CMD_RC_S = b"RC:S\r\n"
+_CMD_FUNCTION = b"FUNCTION\r\n"
+_CMD_WA = b"WA\r\n"
+_CMD_WB = b"WB\r\n"
+_CMD_W = b"W\r\n"
+_CMD_IA = b"IA\r\n"
+_CMD_IB = b"IB\r\n"
+_CMD_MODE = b"MODE\r\n"
+_CMD_ENABLE_B = b"ENABLE_B\r\n"
+_CMD_CURRENT_A = b"CURRENT:A\r\n"
+_CMD_CURRENT_B = b"CURRENT:B\r\n"
+_CMD_CURRENT = b"CURRENT\r\n"
+_CMD_AINA = b"AINA\r\n"
+_CMD_AINB = b"AINB\r\n"
+
+# Pre-encoded write verbs, the value is appended per call
+_PFX_CURRENT = b"CURRENT "
+_PFX_CURRENT_A = b"CURRENT:A "
+_PFX_CURRENT_B = b"CURRENT:B "
+_PFX_AINA = b"AINA "
+_PFX_AINB = b"AINB "
+
+# Mode values as they appear right after the echoed AINx / MODE command
+_AIN_MODES = {ord("V"): "V", ord("C"): "C"}
+_PAM_MODES = {b"STD": "STD", b"EXP": "EXP"}
+
+# RC:S bits
+_PIN15_MASK = 1 << 6
+_PIN6_MASK = 1 << 3
+
+# READYA status word: channel A/B bits are 14/15 in function 196 and 7/8 in
+# function 195; (status >> shift) & 3 indexes _READY_TABLE
+_READY_TABLE = ("ALL OFF", "A ACTIVE", "B ACTIVE", "A + B ACTIVE")
+_READY_196_SHIFT = 14
+_READY_195_SHIFT = 7
+_READY_195_ALL_OFF = 65532  # reported with both channels off
+
+
+# ---------- response parsers ----------
+
+def _extract_number(resp):
+    m = _NUM_RE.search(resp)
+    return float(m.group()) if m else None
+
+
+def _extract_mode(resp):
+    # Usually b"AINA V...": read the byte after the echoed command
+    i = resp.find(b"AIN") + 5
+    if 4 < i < len(resp):
+        mode = _AIN_MODES.get(resp[i])
+        if mode:
+            return mode
+    return "V" if b"V" in resp else ("C" if b"C" in resp else None)
+
+
+def _extract_pam_mode(resp):
+    # Usually b"MODE STD...": read the word after the echoed command
+    i = resp.find(b"MODE ") + 5
+    if i > 4:
+        mode = _PAM_MODES.get(resp[i:i + 3])
+        if mode:
+            return mode
+    return "STD" if b"STD" in resp else ("EXP" if b"EXP" in resp else None)
+
+
+def _extract_bool(resp):
+    return True if b"ON" in resp else (False if b"OFF" in resp else None)
+
+
+# Commands polled together by read_settings(): (command, result key, parser)
+_READ_SETTINGS = (
+    ("FUNCTION", "function", _extract_number),
+    ("AINA", "mode_a", _extract_mode),
+    ("AINB", "mode_b", _extract_mode),
+    ("MODE", "pam_mode", _extract_pam_mode),
+)
+_READ_SETTINGS_CMDS = tuple(c for c, _, _ in _READ_SETTINGS)
+
+# Measurements and status polled together by read_block_196()/read_block_195();
+# READYA and RC:S are decoded afterwards (see _decode_ready)
+_READ_BLOCK_196 = (
+    ("WA", "wa", _extract_number),
+    ("WB", "wb", _extract_number),
+    ("IA", "ia", _extract_number),
+    ("IB", "ib", _extract_number),
+    ("RX1:READYA", "ready", _extract_number),
+    ("RC:S", "rc_s", _extract_number),
+    ("ENABLE_B", "enabled_b", _extract_bool),
+    ("CURRENT:A", "current_a", _extract_number),
+    ("CURRENT:B", "current_b", _extract_number),
+)
+_READ_BLOCK_195 = (
+    ("W", "w", _extract_number),
+    ("IA", "ia", _extract_number),
+    ("IB", "ib", _extract_number),
+    ("RX1:READYA", "ready", _extract_number),
+    ("RC:S", "rc_s", _extract_number),
+    ("ENABLE_B", "enabled_b", _extract_bool),
+    ("CURRENT", "current", _extract_number),
+)
+_READ_BLOCK_196_CMDS = tuple(c for c, _, _ in _READ_BLOCK_196)
+_READ_BLOCK_195_CMDS = tuple(c for c, _, _ in _READ_BLOCK_195)
+
+
+def _decode_ready(val_raw, mode):
+    """READYA value -> "ALL OFF"/"A ACTIVE"/... for function 196 or 195."""
+    if val_raw is None:
+        return "No Data"
+
+    # Convert float to int (e.g., -4.0 -> -4)
+    val = int(val_raw)
+
+    # --- MODE 196 LOGIC (Standard / Dual Throttle) ---
+    if mode == 196:
+        return _READY_TABLE[(val >> _READY_196_SHIFT) & 3]
+
+    # --- MODE 195 LOGIC (Directional) ---
+    elif mode == 195:
+        status = val & 0xFFFF
+        if status == _READY_195_ALL_OFF:
+            return "ALL OFF"
+        return _READY_TABLE[(status >> _READY_195_SHIFT) & 3]
+
 
 class PAMController:
     """Interface to the PAM serial controller."""
 
+    # Per-channel AIN query, anything other than A selects B
+    _AIN_CMDS = {"A": _CMD_AINA, "a": _CMD_AINA, "B": _CMD_AINB, "b": _CMD_AINB}
+
     def __init__(self):
         self.ser = SerialReconnect(
             port=PAM_PORT,
             baudrate=PAM_BAUD,
-            timeout=0.15,
+            timeout=0.2,  # max wait for the '>' prompt per command
             write_timeout=0.15,
             name="PAM"
         )
+        # Bound SerialReconnect methods for the per-command path; they follow
+        # the port across reconnects, so they never need rebinding
+        self._write = self.ser.write
+        self._read = self.ser.read
+        self._read_until = self.ser.read_until
         self._connected_once = False
         self._verify_writes = True
+        # Last RC:S bitfield as (monotonic time, int or None)
+        self._rc_s_cache = (0.0, None)
+        # Held for a whole exchange (command write + reply read): the main
+        # loop and the command processor thread share the port.
+        # Reentrant, cmd_batch() falls back to cmd() and SAVE waits inside
+        self._io_lock = RLock()
+        # Whether the PAM answers pipelined commands (None = not known yet)
+        self._batch_ok = None
+
+    def _drain_input(self):
+        """Drop stale reply bytes; a plain read instead of a tcflush syscall."""
+        n = self.ser.in_waiting
+        if n:
+            self._read(n)
 
     def cmd(self, command):
-        """Send a command and read until the prompt '>' is received."""
+        """Send a command and return the raw reply bytes up to the prompt '>'."""
+        return self._cmd_bytes((command + "\r\n").encode())
+
+    def _cmd_value(self, prefix, value):
+        """cmd() for a write: pre-encoded verb prefix (_PFX_*) plus a value."""
+        return self._cmd_bytes(prefix + str(value).encode() + b"\r\n")
+
+    def _cmd_num(self, payload):
+        """Send a query and return the number in its reply (or None)."""
+        return _extract_number(self._cmd_bytes(payload))
+
+    def _cmd_mode(self, payload):
+        """Send an AINx query and return "V"/"C" (or None)."""
+        return _extract_mode(self._cmd_bytes(payload))
+
+    def _cmd_bool(self, payload):
+        """Send an ON/OFF query and return True/False (or None)."""
+        return _extract_bool(self._cmd_bytes(payload))
+
+    def _cmd_bytes(self, payload):
+        """cmd() for an already encoded command line (see the _CMD_* constants)."""
         try:
-            # Clear input buffer
-            self.ser.reset_input_buffer()
-
-            # Send command
-            self.ser.write((command + "\r\n").encode())
-
-            # Read until '>' appears or timeout
-            response = b""
-            start = time.time()
-            timeout = 0.2  # 200ms max per command
-
-            while time.time() - start < timeout:
-                if self.ser.in_waiting:
-                    chunk = self.ser.read(self.ser.in_waiting)
-                    response += chunk
-                    # Stop if we see the prompt '>' or a newline (sometimes prompt is after)
-                    if b">" in chunk or response.endswith(b">"):
-                        break
-                time.sleep(0.001)  # Yield to other threads
+            with self._io_lock:
+                # Clear input buffer
+                self._drain_input()
+
+                # Send command
+                self._write(payload)
 
-            return response.decode(errors="ignore")
+                # Block until the prompt '>' arrives or the port timeout expires
+                return self._read_until(b">", 512)
         except Exception as e:
             print(f"❌ PAM command error: {e}")
-            return ""
+            return b""
+
+    def cmd_batch(self, commands, fallback=True):
+        """
+        Send several commands in one write and return their raw replies, in order.
+        Each reply is read up to its own '>' prompt. If the PAM drops part of
+        the pipeline, the remaining commands are sent one at a time (or get
+        b"" when fallback is False). Once the PAM is known not to accept
+        pipelined commands, they are always sent one at a time.
+        """
+        with self._io_lock:
+            if self._batch_ok is False:
+                return [self.cmd(c) for c in commands]
+
+            replies = []
+            try:
+                self._drain_input()
+                self._write("".join(c + "\r\n" for c in commands).encode())
+
+                for command in commands:
+                    response = self._read_until(b">", 512)
+                    if not response.endswith(b">"):
+                        break
+                    replies.append(response)
+            except Exception as e:
+                print(f"❌ PAM batch command error: {e}")
+
+            if len(replies) == len(commands):
+                self._batch_ok = True
+            elif replies and self._batch_ok is None:
+                # Answered the first command but dropped the rest
+                self._batch_ok = False
+                print("⚠️ PAM does not accept pipelined commands, sending one at a time")
+
+            for command in commands[len(replies):]:
+                replies.append(self.cmd(command) if fallback else b"")
+            return replies
+
+    def probe_batch(self):
+        """Check once whether the PAM answers pipelined commands."""
+        self.cmd_batch(("FUNCTION", "FUNCTION"), fallback=False)
+        if self._batch_ok:
+            print("✔ PAM accepts pipelined commands")
+        return self._batch_ok
+
+    def close(self):
+        """Close the PAM serial port."""
+        self.ser.close()
 
     # --------- verify_writes property ---------
 
@@ -61,138 +268,123 @@ class PAMController:
 
     # ---------- response parsers ----------
 
-    @staticmethod
-    def extract_number(resp):
-        for token in resp.replace(">", "").split():
-            try:
-                return float(token)
-            except ValueError:
-                pass
-        return None
-
-    @staticmethod
-    def extract_mode(resp):
-        if "V" in resp:
-            return "V"
-        if "C" in resp:
-            return "C"
-        return None
-
-    @staticmethod
-    def extract_pam_mode(resp):
-        if "STD" in resp:
-            return "STD"
-        if "EXP" in resp:
-            return "EXP"
-        return None
-
-    @staticmethod
-    def extract_bool(resp):
-        if "ON" in resp:
-            return True
-        if "OFF" in resp:
-            return False
-        return None
+    # Replies are the raw bytes returned by cmd(); the parsers live at module
+    # level, these aliases keep the old PAMController.extract_* names
+
+    extract_number = staticmethod(_extract_number)
+    extract_mode = staticmethod(_extract_mode)
+    extract_pam_mode = staticmethod(_extract_pam_mode)
+    extract_bool = staticmethod(_extract_bool)
 
     # ----------Hidden commands----------
     def read_status_value(self):
-        resp = self.cmd("RX1:READYA")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_READYA)
 
     def read_remote_control_status(self):
-        resp = self.cmd("RC:S")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_RC_S)
+
+    def _read_rc_s(self, max_age=0.05):
+        """RC:S as int, reused for max_age seconds so both pin checks share one read."""
+        now = _monotonic()
+        stamp, val = self._rc_s_cache
+        if now - stamp < max_age:
+            return val
+        val = self.read_remote_control_status()
+        if val is not None:
+            val = int(val)
+        self._rc_s_cache = (now, val)
+        return val
 
     # ---------- high level commands ----------
 
     def read_function(self):
-        resp = self.cmd("FUNCTION")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_FUNCTION)
+
+    def read_settings(self):
+        """Read function, AIN modes and PAM mode in a single serial round-trip."""
+        resp = self.cmd_batch(_READ_SETTINGS_CMDS)
+        return {key: parse(r) for (_, key, parse), r in zip(_READ_SETTINGS, resp)}
+
+    def _read_block(self, spec, commands, func):
+        """Measurements and status of one function in a single round-trip, decoded."""
+        resp = self.cmd_batch(commands)
+        values = {key: parse(r) for (_, key, parse), r in zip(spec, resp)}
+
+        rc_s = values.pop("rc_s")
+        if rc_s is not None:
+            rc_s = int(rc_s)
+
+        values["ready"] = _decode_ready(values["ready"], func)
+        values["pin15"] = rc_s is not None and (rc_s & _PIN15_MASK) > 0
+        values["pin6"] = rc_s is not None and (rc_s & _PIN6_MASK) > 0
+        return values
+
+    def read_block_196(self):
+        """
+        WA, WB, IA, IB, READY, PIN 15/6, ENABLE_B and CURRENT A/B for
+        function 196 in a single serial round-trip.
+        """
+        return self._read_block(_READ_BLOCK_196, _READ_BLOCK_196_CMDS, 196)
+
+    def read_block_195(self):
+        """
+        W, IA, IB, READY, PIN 15/6, ENABLE_B and CURRENT for function 195 in
+        a single serial round-trip.
+        """
+        return self._read_block(_READ_BLOCK_195, _READ_BLOCK_195_CMDS, 195)
 
     def read_ain_mode(self, channel='A'):
-        cmd = "AINA" if channel.upper() == 'A' else "AINB"
-        resp = self.cmd(cmd)
-        return self.extract_mode(resp)
+        return self._cmd_mode(self._AIN_CMDS.get(channel, _CMD_AINB))
 
     def read_wa(self):
-        resp = self.cmd("WA")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_WA)
 
     def read_wb(self):
-        resp = self.cmd("WB")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_WB)
 
     def read_w(self):
-        resp = self.cmd("W")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_W)
 
     def read_ia(self):
-        resp = self.cmd("IA")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_IA)
 
     def read_ib(self):
-        resp = self.cmd("IB")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_IB)
 
-    def ensure_std_mode(self):
-        """Check and force STD mode if needed."""
-        resp = self.cmd("MODE")
-        mode = self.extract_pam_mode(resp)
+    def ensure_std_mode(self, mode=None):
+        """
+        Check and force STD mode if needed. Pass the mode if it was just read
+        (read_settings() returns it as "pam_mode") to skip the query.
+        """
+        if mode is None:
+            mode = _extract_pam_mode(self._cmd_bytes(_CMD_MODE))
         if mode == "EXP":
             self.cmd("MODE STD")
-            time.sleep(0.1)
-            self.cmd("MODE")   # verify
+            _sleep(0.1)
+            self._cmd_bytes(_CMD_MODE)   # verify
 
         if not self._connected_once:
             print("✔ PAM MODE verified as STD")
             self._connected_once = True
 
-    def get_ready_status(self):
-        """Decode PAM Status Word properly based on Mode 195 or 196."""
+    def get_ready_status(self, mode=None):
+        """
+        Decode PAM Status Word properly based on Mode 195 or 196. Pass the
+        function if it is already known to skip the FUNCTION query.
+        """
         try:
-            # response is now a float/int because of self.extract_number()
+            # response is now a float/int because of _extract_number()
             val_raw = self.read_status_value()
 
             if val_raw is None:
                 return "No Data"
 
-            # Convert float to int (e.g., -4.0 -> -4)
-            val = int(val_raw)
-            mode = self.read_function()
-
-            # --- MODE 196 LOGIC (Standard / Dual Throttle) ---
-            if mode == 196:
-                status = val & 0xFFFF
-                chA = (status & 16384) > 0   # Bit 14
-                chB = (status & 32768) > 0   # Bit 15
-
-                if chA and chB:
-                    return "A + B ACTIVE"
-                elif chA:
-                    return "A ACTIVE"
-                elif chB:
-                    return "B ACTIVE"
-                else:
-                    return "ALL OFF"
-
-            # --- MODE 195 LOGIC (Directional) ---
-            elif mode == 195:
-                status = val & 0xFFFF
-                chB_ok = (status & 256) > 0   # Bit 8
-                chA_ok = (status & 128) > 0   # Bit 7
-
-                if status == 65532:
-                    return "ALL OFF"
-                if chA_ok and chB_ok:
-                    return "A + B ACTIVE"
-                elif chA_ok:
-                    return "A ACTIVE"
-                elif chB_ok:
-                    return "B ACTIVE"
-                else:
-                    return "ALL OFF"
+            if mode is None:
+                mode = self.read_function()
+
+            return _decode_ready(val_raw, mode)
         except Exception as e:
-            # This is where your 'got float' error was being caught
+            # Serial or decode failure while reading the status word
             return f"READY Error: {e}"
 
     def get_pin_15_status(self):
@@ -201,13 +393,12 @@ class PAMController:
         Based on your data: PIN 15 adds 64 to the RC:S value.
         """
         try:
-            val = self.read_remote_control_status()
+            val = self._read_rc_s()
 
             if val is None:
                 return False  # Default to OFF if reading fails
-            val = int(val)
             # Check Bit 6 (Binary 64)
-            return (val & 64) > 0
+            return (val & _PIN15_MASK) > 0
 
         except Exception as e:
             print(f"❌ PAM command error: {e}")
@@ -220,26 +411,23 @@ class PAMController:
         Works even if PIN 15 is OFF.
         """
         try:
-            val = self.read_remote_control_status()
+            val = self._read_rc_s()
             if val is None:
                 return False  # Default to OFF if reading fails
-            val = int(val)
             # Check Bit 3 (Binary 8)
-            return (val & 8) > 0
+            return (val & _PIN6_MASK) > 0
         except Exception as e:
             print(f"❌ PAM command error: {e}")
             return False
 
     def get_enabled_b_status(self):
-        resp = self.cmd("ENABLE_B")
-        return self.extract_bool(resp)
+        return self._cmd_bool(_CMD_ENABLE_B)
 
     def get_current_a_status(self):
         """
         Returns the current value for A channel in 196 mode
         """
-        resp = self.cmd("CURRENT:A")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_CURRENT_A)
 
     def get_current_b_status(self):
         """
@@ -248,15 +436,13 @@ class PAMController:
         """
         Returns the current value for B channel.
         """
-        resp = self.cmd("CURRENT:B")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_CURRENT_B)
 
     def get_current_status(self):
         """
         Returns the current value for A channel in 195 mode
         """
-        resp = self.cmd("CURRENT")
-        return self.extract_number(resp)
+        return self._cmd_num(_CMD_CURRENT)
 
     # ------------ write commands ----------
 
@@ -264,32 +450,29 @@ class PAMController:
         """
         Writes the current value to the PAM.
         """
-        cmd = f"CURRENT:A {value}"
-        self.cmd(cmd)
+        self._cmd_value(_PFX_CURRENT_A, value)
         return True
 
     def write_current_b(self, value):
         """
         Writes the current value to the PAM.
         """
-        cmd = f"CURRENT:B {value}"
-        self.cmd(cmd)
+        self._cmd_value(_PFX_CURRENT_B, value)
         return True
 
     def write_current(self, value):
         """
         Writes the current value to the PAM.
         """
-        cmd = f"CURRENT {value}"
-        self.cmd(cmd)
+        self._cmd_value(_PFX_CURRENT, value)
         return True
 
     def write_ain_mode(self, mode, channel='A'):
         """
         Writes the input mode to the PAM.
         """
-        cmd = f"AINA {mode}" if channel.upper() == 'A' else f"AINB {mode}"
-        self.cmd(cmd)
+        prefix = _PFX_AINA if channel in ('A', 'a') else _PFX_AINB
+        self._cmd_value(prefix, mode)
         return True
 
     def write_function_mode(self, mode):
@@ -299,12 +482,51 @@ class PAMController:
         self.cmd(f"FUNCTION {mode}")
         return True
 
-    def save_pam_settings(self):
+    def save_pam_settings(self, timeout=3.0):
         """
-        Saves the PAM settings to the EEPROM.
+        Saves the PAM settings to the EEPROM and waits for the prompt that
+        follows the write, so its reply is never left for the next command.
+        Returns False if the prompt doesn't arrive within timeout.
         """
-        self.cmd("SAVE")
-        return True
+        with self._io_lock:
+            if self.cmd("SAVE").endswith(b">"):
+                return True
+            return self._wait_save_complete(timeout)
+
+    def _wait_save_complete(self, timeout=3.0):
+        """
+        Wait for the prompt that follows SAVE, which the PAM only sends once
+        the EEPROM write is done. Returns False if timeout expires first.
+        """
+        deadline = _monotonic() + timeout
+        try:
+            with self._io_lock:
+                while _monotonic() < deadline:
+                    if self._read_until(b">", 512).endswith(b">"):
+                        return True
+        except Exception as e:
+            print(f"❌ PAM command error: {e}")
+        return False
+
+    def wait_ain_mode(self, mode, channel='A', timeout=0.5):
+        """
+        Wait until AINx reads back as mode after write_ain_mode().
+        Returns False if timeout expires first.
+        """
+        return self._poll_until(lambda: self.read_ain_mode(channel), mode, timeout)
+
+    def _poll_until(self, read, expected, timeout, interval=0.01):
+        """
+        Call read() until it returns expected (e.g. a setting read back after
+        a write). Returns False if timeout expires first.
+        """
+        deadline = _monotonic() + timeout
+        while True:
+            if read() == expected:
+                return True
+            if _monotonic() >= deadline:
+                return False
+            _sleep(interval)
 
     # ---------- change mode ----------
 
@@ -314,28 +536,28 @@ class PAMController:
             return False
 
         try:
-            # Flush before starting
-            self.ser.reset_input_buffer()
-
             # Send FUNCTION_MODE command
             self.write_function_mode(new_mode)
-            time.sleep(0.5)
+            # Wait until the switch has taken effect (at most the old 0.5 s
+            # settle time) before resetting the currents
+            if not self._poll_until(self.read_function, float(new_mode), 0.5):
+                print(f"⚠️ PAM FUNCTION {new_mode} not read back yet")
 
             # Reset current values for both channels (same for both modes)
             self.cmd("IA 0")
-            time.sleep(0.1)
+            if not self._poll_until(self.read_ia, 0, 0.1):
+                print("⚠️ PAM IA not read back as 0 yet")
             self.cmd("IB 0")
-            time.sleep(0.1)
+            if not self._poll_until(self.read_ib, 0, 0.1):
+                print("⚠️ PAM IB not read back as 0 yet")
 
-            # Save settings once
-            self.save_pam_settings()
-            time.sleep(3.0)  # Wait for EEPROM write
+            # Save settings once, waiting for the prompt that follows the
+            # EEPROM write, only then read the function back
+            if not self.save_pam_settings(timeout=3.0):
+                print("⚠️ PAM SAVE not confirmed")
 
             # Verify
-            self.ser.reset_input_buffer()
-            resp = self.read_function()
-
-            return resp == float(new_mode)
+            return self.read_function() == float(new_mode)
 
         except Exception as e:
             print(f"❌ Error in change_pam_function: {e}")
@@ -349,19 +571,15 @@ class PAMController:
             return False
 
         try:
-            # Flush before starting
-            self.ser.reset_input_buffer()
-
             # Send AIN mode command
             self.write_ain_mode(unit, channel)
-            time.sleep(0.5)
+            if not self.wait_ain_mode(unit, channel):
+                print(f"⚠️ AIN{channel} not read back as {unit} yet")
 
-            # Save settings
+            # Save settings (waits for the EEPROM write)
             self.save_pam_settings()
-            time.sleep(3.0)  # Wait for EEPROM write
 
             # Verify
-            self.ser.reset_input_buffer()
             resp = self.read_ain_mode(channel)
 
             return resp == unit
@@ -370,6 +588,13 @@ class PAMController:
             print(f"❌ Error in change_pam_ain_mode: {e}")
             return False
 
+    # (mode, channel) -> (write, verify) used by set_current_value
+    _CURRENT_DISPATCH = {
+        ("195", "A"): (write_current, get_current_status),
+        ("196", "A"): (write_current_a, get_current_a_status),
+        ("196", "B"): (write_current_b, get_current_b_status),
+    }
+
     def set_current_value(self, value, channel, mode):
         """
         Set current value for A or B channel.
@@ -400,60 +625,34 @@ class PAMController:
                 print(f"❌ Invalid channel {channel} for mode 196")
                 return False
 
+            write_func, verify_func = self._CURRENT_DISPATCH.get(
+                (mode, channel), (None, None))
+            if write_func is None:
+                print(f"❌ Invalid mode {mode}")
+                return False
+
             print(f"📌 Mode {mode}: setting channel {channel} to {value}mA")
 
             # === EXECUTION ===
-            # Flush before starting
-            self.ser.reset_input_buffer()
+            if not write_func(self, value):
+                return False
 
-            # Send command based on mode and channel
-            if mode == "195":
-                # Mode 195: Single channel command
-                success = self.write_current(value)
-                time.sleep(0.5)
-
-                if success:
-                    self.save_pam_settings()
-                    time.sleep(3.0)
-
-                    # Optional verification
-                    if self._verify_writes:
-                        resp = self.get_current_status()
-                        if resp == value:
-                            print(f"✅ Current set and verified")
-                        else:
-                            print(
-                                f"⚠️ Verification failed: expected {value}, got {resp}")
-                            return False
-                    return True
-
-            elif mode == "196":
-                # Mode 196: Channel-specific command
-                if channel == 'A':
-                    success = self.write_current_a(value)
-                    verify_func = self.get_current_a_status
-                else:  # channel B
-                    success = self.write_current_b(value)
-                    verify_func = self.get_current_b_status
-
-                time.sleep(0.5)
-
-                if success:
-                    self.save_pam_settings()
-                    time.sleep(3.0)
-
-                    # Optional verification
-                    if self._verify_writes:
-                        resp = verify_func()
-                        if resp == value:
-                            print(f"✅ Current set and verified")
-                        else:
-                            print(
-                                f"⚠️ Verification failed: expected {value}, got {resp}")
-                            return False
-                    return True
+            # Wait until the new value reads back before saving
+            if not self._poll_until(lambda: verify_func(self), float(value), 0.5):
+                print(f"⚠️ Current {value}mA not read back yet")
 
-            return False
+            self.save_pam_settings()
+
+            # Optional verification
+            if self._verify_writes:
+                resp = verify_func(self)
+                if resp == value:
+                    print(f"✅ Current set and verified")
+                else:
+                    print(
+                        f"⚠️ Verification failed: expected {value}, got {resp}")
+                    return False
+            return True
 
         except ValueError:
             print(f"❌ Invalid value format: {value}")
@@ -1,255 +1,295 @@
 #!/usr/bin/env python3
 # main.py
 import time
+import queue
 import threading
 import traceback
 import sys
 
 from config import (
-    MAIN_LOOP_DELAY, MODE_CHECK_INTERVAL,
+    MAIN_LOOP_DELAY, TRANSITION_WAIT_TIMEOUT, SETTINGS_POLL_INTERVAL,
     VPIN_WA, VPIN_WB, VPIN_IA, VPIN_IB, VPIN_TEMP
 )
 from state import MachineState
 from hardware.pam import PAMController
-from hardware.dwin import DWINDisplay
+from hardware.dwin import DWINDisplay, scale_value
 from ble.gatt_server import run_ble_server
 from ble.command_processor import CommandProcessor, CommandType
 
+# Recovery delays double on each consecutive failure, up to this (seconds)
+RESTART_MAX_DELAY = 30.0
 
-def safe_execution(func, default=None, error_msg=None):
-    """Execute a function safely, return default on error."""
+
+def safe_execution(func, *args, default=None, error_msg=None):
+    """Execute func(*args) safely, return default on error."""
     try:
-        return func()
+        return func(*args)
     except Exception as e:
         if error_msg:
             print(f"⚠️ {error_msg}: {e}")
         return default
 
 
-def main_loop(state, pam, dwin, write_lock, cmd_processor):
+def dwin_writer(dwin_q):
+    """Run queued DWIN writes so PAM reads never wait on the display port."""
+    while True:
+        job = dwin_q.get()
+        try:
+            if job is None:  # stop
+                return
+            func, args = job
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"⚠️ DWIN {func.__name__}{args} failed: {e}")
+        finally:
+            dwin_q.task_done()
+
+
+def start_dwin_writer():
+    """Start a DWIN writer thread and return its queue."""
+    dwin_q = queue.Queue(maxsize=16)
+    threading.Thread(
+        target=dwin_writer,
+        args=(dwin_q,),
+        daemon=True,
+        name="DWIN-Writer"
+    ).start()
+    return dwin_q
+
+
+# ---------- per-function reads ----------
+# Each handler takes (pam, settings) from the read_settings() poll, reads the
+# function's measurements and status in one round-trip and returns the DWIN
+# (vpin, value) list and the fields to publish to state.
+
+# Temperature - no sensor yet, always 24.0
+_TEMP_ITEM = (VPIN_TEMP, 24.0)
+
+
+def read_196(pam, settings):
+    """Function 196: independent A and B channels."""
+    mode_a = settings["mode_a"]
+    mode_b = settings["mode_b"]
+    # WA, WB, IA, IB, READY, pins, ENABLE_B and currents in one round-trip
+    status = safe_execution(pam.read_block_196, default={},
+                            error_msg="PAM status read failed")
+    wa = status.get("wa")
+    wb = status.get("wb")
+    ia = status.get("ia")
+    ib = status.get("ib")
+
+    display = []
+    scaled_wa = scaled_wb = None
+
+    # WA - only if both wa and mode_a are valid
+    if wa is not None and mode_a is not None:
+        scaled_wa = scale_value(wa, mode_a, 196)
+        if scaled_wa is not None:
+            display.append((VPIN_WA, scaled_wa))
+
+    # WB - only if both wb and mode_b are valid
+    if wb is not None and mode_b is not None:
+        scaled_wb = scale_value(wb, mode_b, 196)
+        if scaled_wb is not None:
+            display.append((VPIN_WB, scaled_wb))
+
+    # IA/IB - always send, 0 if not read
+    display.append((VPIN_IA, (ia or 0) * 0.1))
+    display.append((VPIN_IB, (ib or 0) * 0.1))
+    display.append(_TEMP_ITEM)
+
+    return display, dict(
+        FUNC=196,
+        WA=scaled_wa,
+        WB=scaled_wb,
+        IA=ia,
+        IB=ib,
+        MODE=mode_a if mode_a is not None else "UNKNOWN",
+        READY=status.get("ready"),
+        PIN15=status.get("pin15"),
+        PIN6=status.get("pin6"),
+        ENABLED_B=status.get("enabled_b"),
+        CURRENT_A_STATUS=status.get("current_a"),
+        CURRENT_B_STATUS=status.get("current_b"),
+        CURRENT_STATUS=None,
+    )
+
+
+def read_195(pam, settings):
+    """Function 195: single (directional) channel on A."""
+    mode_a = settings["mode_a"]
+    # W (instead of WA), IA, IB, READY, pins, ENABLE_B and current in one
+    # round-trip; WA/WB are never queried
+    status = safe_execution(pam.read_block_195, default={},
+                            error_msg="PAM status read failed")
+    wa = status.get("w")
+    ia = status.get("ia")
+    ib = status.get("ib")
+
+    display = []
+    scaled_wa = None
+
+    # WA - only if both wa and mode_a are valid
+    if wa is not None and mode_a is not None:
+        scaled_wa = scale_value(wa, mode_a, 195)
+        if scaled_wa is not None:
+            display.append((VPIN_WA, scaled_wa))
+
+    # WB is always 0 for function 195
+    display.append((VPIN_WB, 0.0))
+
+    # IA/IB
+    display.append((VPIN_IA, (ia or 0) * 0.1))
+    display.append((VPIN_IB, (ib or 0) * 0.1))
+    display.append(_TEMP_ITEM)
+
+    return display, dict(
+        FUNC=195,
+        WA=scaled_wa,
+        WB=0.0,
+        IA=ia,
+        IB=ib,
+        MODE=mode_a if mode_a is not None else "UNKNOWN",
+        READY=status.get("ready"),
+        PIN15=status.get("pin15"),
+        PIN6=status.get("pin6"),
+        ENABLED_B=status.get("enabled_b"),
+        CURRENT_A_STATUS=None,
+        CURRENT_B_STATUS=None,
+        CURRENT_STATUS=status.get("current"),
+    )
+
+
+FUNC_HANDLERS = {196: read_196, 195: read_195}
+
+
+def main_loop(state, pam, dwin, write_lock, cmd_processor, dwin_q):
     """Main processing loop - isolated so it can be restarted."""
-    last_mode_check = 0
     loop_count = 0
     mismatch_page_active = False
     last_page_switch = 0
-    PAGE_COOLDOWN = 2.0
+    # Intervals in integer nanoseconds, compared against time.monotonic_ns()
+    page_cooldown_ns = 2_000_000_000
+    settings_poll_ns = int(SETTINGS_POLL_INTERVAL * 1e9)
+    loop_delay_ns = int(MAIN_LOOP_DELAY * 1e9)
+    # Function/AIN modes from the last settings read, and when it happened
+    settings = {}
+    last_settings_read = 0
+    # Last fields published to state, to skip identical updates
+    last_update = None
+    # Delay before retrying after an error, reset by every completed pass
+    error_delay = 2.0
+    # Bind the per-pass globals/attributes once (local lookups are cheaper)
+    monotonic_ns = time.monotonic_ns
+    sleep = time.sleep
+    write_pending = write_lock.is_set
+    in_transition = state.is_in_transition
+    publish = state.update
+    read_settings = pam.read_settings
+    get_handler = FUNC_HANDLERS.get
+    dwin_put = dwin_q.put
+    send_mode = dwin.send_mode
+    send_values = dwin.send_values
 
     while True:
         try:
-            if write_lock.is_set():
-                time.sleep(0.05)  # short delay, then retry
+            if write_pending():
+                # Settings may change under us, re-read and re-publish after
+                last_settings_read = 0
+                last_update = None
+                sleep(0.05)  # short delay, then retry
                 continue
 
-            now = time.time()
+            now = monotonic_ns()
             loop_count += 1
 
             # CRITICAL: Skip if system is in transition
-            if state.is_in_transition():
-                time.sleep(0.05)  # Short sleep, then check again
+            if in_transition():
+                last_settings_read = 0
+                last_update = None
+                # Block until the command processor clears the flag
+                state.wait_for_transition(timeout=TRANSITION_WAIT_TIMEOUT)
                 continue
 
-            # Periodically enforce STD mode
-            if now - last_mode_check > MODE_CHECK_INTERVAL:
+            # FUNCTION, AIN and PAM modes (which rarely change) only every
+            # SETTINGS_POLL_INTERVAL, in one round-trip; the function is
+            # critical, skip if it fails
+            if now - last_settings_read >= settings_poll_ns:
+                settings = safe_execution(read_settings, default={})
+                last_settings_read = now
+                # Enforce STD mode; only talks to the PAM if it isn't STD
                 safe_execution(
-                    pam.ensure_std_mode,
+                    pam.ensure_std_mode, settings.get("pam_mode"),
                     error_msg="PAM mode check failed"
                 )
-                last_mode_check = now
-
-            # Read current function - this is critical, skip if fails
-            func_val = safe_execution(pam.read_function)
+            func_val = settings.get("function")
             if func_val is None:
-                time.sleep(0.2)  # Longer sleep if no function
+                last_settings_read = 0
+                sleep(0.2)  # Longer sleep if no function
                 continue
 
             func = int(func_val)
 
-            # Initialize variables
-            mode_a = mode_b = None
-            wa = wb = ia = ib = None
-            scaled_wa = scaled_wb = None
-
-            # ---------------- FUNCTION 196 ----------------
-            if func == 196:
-                # Read all values safely
-                mode_a = safe_execution(lambda: pam.read_ain_mode('A'))
-                mode_b = safe_execution(lambda: pam.read_ain_mode('B'))
-                wa = safe_execution(pam.read_wa)
-                wb = safe_execution(pam.read_wb)
-                ia = safe_execution(pam.read_ia)
-                ib = safe_execution(pam.read_ib)
-                ready = safe_execution(pam.get_ready_status)
-                pin15 = safe_execution(pam.get_pin_15_status)
-                pin6 = safe_execution(pam.get_pin_6_status)
-                enabled_b = safe_execution(pam.get_enabled_b_status)
-                current_a_status = safe_execution(pam.get_current_a_status)
-                current_b_status = safe_execution(pam.get_current_b_status)
-
-                # Switch to page 28
-                if mode_a and mode_b and mode_a != mode_b:
-                    if not state.is_in_transition():
-                        if now - last_page_switch > PAGE_COOLDOWN:
-                            if not mismatch_page_active:
-                                dwin.switch_page(28)
-                                mismatch_page_active = True
-
-                            sel = dwin.read_vp_5100()
-                            if sel == 0:
-                                cmd_processor.submit(
-                                    CommandType.SET_AIN_MODE,
-                                    {"unit": "V"}
-                                )
-                            elif sel == 1:
-                                cmd_processor.submit(
-                                    CommandType.SET_AIN_MODE,
-                                    {"unit": "C"}
-                                )
-                            time.sleep(0.1)
-                            continue
-                    else:
-                        if mismatch_page_active:
-                            dwin.switch_page(0)
-                            mismatch_page_active = False
-
-                # Update display - with safe execution for each operation
-                if mode_a:
-                    safe_execution(
-                        lambda: dwin.send_mode(mode_a),
-                        error_msg="DWIN send_mode failed"
-                    )
-
-                # WA - only if both wa and mode_a are valid
-                if wa is not None and mode_a is not None:
-                    scaled_wa = safe_execution(
-                        lambda: dwin.scale_value(wa, mode_a, 196)
-                    )
-                    if scaled_wa is not None:
-                        safe_execution(
-                            lambda: dwin.send_value(VPIN_WA, scaled_wa),
-                            error_msg=f"DWIN send_value WA failed: {scaled_wa}"
-                        )
-
-                # WB - only if both wb and mode_b are valid
-                if wb is not None and mode_b is not None:
-                    scaled_wb = safe_execution(
-                        lambda: dwin.scale_value(wb, mode_b, 196)
-                    )
-                    if scaled_wb is not None:
-                        safe_execution(
-                            lambda: dwin.send_value(VPIN_WB, scaled_wb),
-                            error_msg=f"DWIN send_value WB failed: {scaled_wb}"
-                        )
-
-                # IA/IB - always send if not None, else send 0
-                ia_val = ia / 10.0 if ia is not None else 0.0
-                safe_execution(
-                    lambda: dwin.send_value(VPIN_IA, ia_val),
-                    error_msg=f"DWIN send_value IA failed: {ia_val}"
-                )
-
-                ib_val = ib / 10.0 if ib is not None else 0.0
-                safe_execution(
-                    lambda: dwin.send_value(VPIN_IB, ib_val),
-                    error_msg=f"DWIN send_value IB failed: {ib_val}"
-                )
-
-                # Temperature - always send 24.0
-                safe_execution(
-                    lambda: dwin.send_value(VPIN_TEMP, 24.0),
-                    error_msg="DWIN send_value TEMP failed"
-                )
-
-                # Save for BLE - with None handling
-                state.update(
-                    FUNC=func,
-                    WA=scaled_wa,
-                    WB=scaled_wb,
-                    IA=ia,
-                    IB=ib,
-                    MODE=mode_a if mode_a is not None else "UNKNOWN",
-                    READY=ready,
-                    PIN15=pin15,
-                    PIN6=pin6,
-                    ENABLED_B=enabled_b,
-                    CURRENT_A_STATUS=current_a_status,
-                    CURRENT_B_STATUS=current_b_status,
-                    CURRENT_STATUS=None,
-                )
-
-            # ---------------- FUNCTION 195 ----------------
-            elif func == 195:
-                mode_a = safe_execution(lambda: pam.read_ain_mode('A'))
-                wa = safe_execution(pam.read_w)  # uses 'W' command
-                ia = safe_execution(pam.read_ia)
-                ib = safe_execution(pam.read_ib)
-                ready = safe_execution(pam.get_ready_status)
-                pin15 = safe_execution(pam.get_pin_15_status)
-                pin6 = safe_execution(pam.get_pin_6_status)
-                enabled_b = safe_execution(pam.get_enabled_b_status)
-                current_status = safe_execution(pam.get_current_status)
-
-                if mode_a:
-                    safe_execution(
-                        lambda: dwin.send_mode(mode_a),
-                        error_msg="DWIN send_mode failed"
-                    )
-
-                # WA - only if both wa and mode_a are valid
-                if wa is not None and mode_a is not None:
-                    scaled_wa = safe_execution(
-                        lambda: dwin.scale_value(wa, mode_a, 195)
-                    )
-                    if scaled_wa is not None:
-                        safe_execution(
-                            lambda: dwin.send_value(VPIN_WA, scaled_wa),
-                            error_msg=f"DWIN send_value WA failed: {scaled_wa}"
-                        )
-
-                # WB is always 0 for function 195
-                safe_execution(
-                    lambda: dwin.send_value(VPIN_WB, 0.0),
-                    error_msg="DWIN send_value WB failed"
-                )
-
-                # IA/IB
-                ia_val = ia / 10.0 if ia is not None else 0.0
-                safe_execution(
-                    lambda: dwin.send_value(VPIN_IA, ia_val),
-                    error_msg=f"DWIN send_value IA failed: {ia_val}"
-                )
-
-                ib_val = ib / 10.0 if ib is not None else 0.0
-                safe_execution(
-                    lambda: dwin.send_value(VPIN_IB, ib_val),
-                    error_msg=f"DWIN send_value IB failed: {ib_val}"
-                )
-
-                safe_execution(
-                    lambda: dwin.send_value(VPIN_TEMP, 24.0),
-                    error_msg="DWIN send_value TEMP failed"
-                )
-
-                state.update(
-                    FUNC=func,
-                    WA=scaled_wa,
-                    WB=0.0,
-                    IA=ia,
-                    IB=ib,
-                    MODE=mode_a if mode_a is not None else "UNKNOWN",
-                    READY=ready,
-                    PIN15=pin15,
-                    PIN6=pin6,
-                    ENABLED_B=enabled_b,
-                    CURRENT_A_STATUS=None,
-                    CURRENT_B_STATUS=None,
-                    CURRENT_STATUS=current_status,
-                )
-
-            else:
+            handler = get_handler(func)
+            if handler is None:
                 # Unknown function – still update state
-                state.update(FUNC=func, MODE="UNKNOWN")
+                publish(FUNC=func, MODE="UNKNOWN")
+                last_update = None
+                sleep(MAIN_LOOP_DELAY)
+                continue
 
-            time.sleep(MAIN_LOOP_DELAY)
+            mode_a = settings["mode_a"]
+            mode_b = settings["mode_b"]
+
+            # Function 196 with mismatched AIN modes: switch to page 28
+            if func == 196 and mode_a and mode_b and mode_a != mode_b:
+                # Page switch / VP read talk to the DWIN directly, let
+                # the writer thread finish first
+                dwin_q.join()
+                if not in_transition():
+                    if now - last_page_switch > page_cooldown_ns:
+                        if not mismatch_page_active:
+                            dwin.switch_page(28)
+                            mismatch_page_active = True
+
+                        sel = dwin.read_vp_5100()
+                        if sel == 0:
+                            cmd_processor.submit(
+                                CommandType.SET_AIN_MODE,
+                                {"unit": "V"}
+                            )
+                        elif sel == 1:
+                            cmd_processor.submit(
+                                CommandType.SET_AIN_MODE,
+                                {"unit": "C"}
+                            )
+                        sleep(0.1)
+                        continue
+                else:
+                    if mismatch_page_active:
+                        dwin.switch_page(0)
+                        mismatch_page_active = False
+
+            # Update display - queued for the DWIN writer thread
+            if mode_a:
+                dwin_put((send_mode, (mode_a,)))
+
+            # Measurements and status of this function, one round-trip
+            display, update = handler(pam, settings)
+            dwin_put((send_values, (display,)))
+
+            # Save for BLE, unless nothing changed
+            if update != last_update:
+                publish(update)
+                last_update = update
+
+            # Sleep out the rest of the pass, so the cadence doesn't drift
+            # with the time spent on serial I/O
+            sleep_ns = loop_delay_ns - (monotonic_ns() - now)
+            if sleep_ns > 0:
+                sleep(sleep_ns / 1e9)
+            error_delay = 2.0
 
         except KeyboardInterrupt:
             print("\n🛑 Keyboard interrupt received, shutting down...")
@@ -259,8 +299,9 @@ def main_loop(state, pam, dwin, write_lock, cmd_processor):
             # This catches ANY unexpected error in the main loop
             print(f"\n💥 CRITICAL ERROR in main loop: {e}")
             traceback.print_exc()
-            print("🔄 Restarting main loop in 2 seconds...\n")
-            time.sleep(2)
+            print(f"🔄 Restarting main loop in {error_delay:g} seconds...\n")
+            time.sleep(error_delay)
+            error_delay = min(error_delay * 2, RESTART_MAX_DELAY)
             # Continue the while loop - it will restart from the top
             continue
 
@@ -276,10 +317,7 @@ def main():
         print(
             f"\n💥 UNCAUGHT GLOBAL EXCEPTION: {exc_type.__name__}: {exc_value}")
         traceback.print_tb(exc_traceback)
-        print("\n🔄 System will restart in 5 seconds...\n")
-        time.sleep(5)
-        # Restart the entire system
-        main()  # Recursive restart - will create new instance
+        # No restart from here: the __main__ loop restarts main()
 
     sys.excepthook = global_exception_handler
 
@@ -289,6 +327,8 @@ def main():
 
     # BLE server runs in background and will auto-reconnect
     ble_thread_running = False
+    # Delay before reinitializing, reset once the hardware is up
+    retry_delay = 3.0
 
     # Main system restart loop
     while True:
@@ -297,7 +337,10 @@ def main():
 
             # Initialize hardware with retries built into the classes
             pam = PAMController()
+            safe_execution(pam.probe_batch,
+                           error_msg="PAM pipelining probe failed")
             dwin = DWINDisplay()
+            dwin_q = start_dwin_writer()
             cmd_processor = CommandProcessor(pam, state)
 
             # Start BLE server only once
@@ -314,9 +357,11 @@ def main():
                 time.sleep(1)  # Give BLE time to initialize
 
             print("--- System running (press Ctrl+C to stop) ---\n")
+            retry_delay = 3.0
 
             # Run the main processing loop
-            main_loop(state, pam, dwin, pam_write_in_progress, cmd_processor)
+            main_loop(state, pam, dwin, pam_write_in_progress, cmd_processor,
+                      dwin_q)
 
         except KeyboardInterrupt:
             print("\n\n🛑 System shutdown complete")
@@ -325,31 +370,36 @@ def main():
         except Exception as e:
             print(f"\n💥 SYSTEM ERROR: {e}")
             traceback.print_exc()
-            print("\n🔄 Reinitializing entire system in 3 seconds...\n")
-            time.sleep(3)
+            print(f"\n🔄 Reinitializing entire system in {retry_delay:g} seconds...\n")
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, RESTART_MAX_DELAY)
 
             # Clean up old connections
-            try:
-                if 'pam' in locals():
-                    pam.ser.ser.close()
-            except:
-                pass
-            try:
-                if 'dwin' in locals():
-                    dwin.ser.ser.close()
-            except:
-                pass
+            if 'dwin_q' in locals():
+                dwin_q.put(None)
+            if 'pam' in locals():
+                pam.close()
+            if 'dwin' in locals():
+                dwin.close()
 
             # Restart the while loop - reinitialize everything
             continue
 
 
 if __name__ == "__main__":
-    try:
-        main()
-    except KeyboardInterrupt:
-        print("\n\n👋 Goodbye!")
-    except Exception as e:
-        print(f"\n💥 FATAL: {e}")
-        traceback.print_exc()
-        print("\n⚠️  System crashed. Restart manually.")
+    # Restart main() in a loop (not recursively), so repeated crashes don't
+    # pile up stack frames
+    restart_delay = 5.0
+    while True:
+        try:
+            main()
+            break  # main() returns on Ctrl+C
+        except KeyboardInterrupt:
+            print("\n\n👋 Goodbye!")
+            break
+        except Exception as e:
+            print(f"\n💥 FATAL: {e}")
+            traceback.print_exc()
+            print(f"\n🔄 System will restart in {restart_delay:g} seconds...\n")
+            time.sleep(restart_delay)
+            restart_delay = min(restart_delay * 2, RESTART_MAX_DELAY)
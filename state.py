@@ -1,5 +1,6 @@
 # state.py
 import threading
+from operator import itemgetter
 
 
 class MachineState:
@@ -24,46 +25,71 @@ class MachineState:
             "CURRENT_B_STATUS": None,
             "CURRENT_STATUS": None
         }
+        # Writers build a new dict and rebind _data (copy-on-write), so a
+        # published dict is never mutated and readers need no lock; the lock
+        # only serialises the writers (main loop, command processor)
         self._lock = threading.Lock()
+        # Set while IN_TRANSITION is False, lets waiters block instead of poll
+        self._settled = threading.Event()
+        self._settled.set()
+        # itemgetters for get_values, keyed by the requested keys tuple
+        self._getters = {}
+        # Called with no arguments after every update, from the writer's thread
+        self._listeners = []
 
-    def update(self, **kwargs):
-        """Update one or more fields."""
+    def add_listener(self, callback):
+        """Call callback() after each update (e.g. to push it to BLE)."""
+        self._listeners.append(callback)
+
+    def update(self, fields=None, **kwargs):
+        """Update one or more fields, from a dict and/or keyword arguments."""
         with self._lock:
-            self._data.update(kwargs)
+            new = self._data.copy()
+            if fields:
+                new.update(fields)
+            if kwargs:
+                new.update(kwargs)
+            self._data = new
+        for callback in self._listeners:
+            callback()
 
     def get_all(self):
         """Return a copy of the whole state dictionary."""
-        with self._lock:
-            return self._data.copy()
+        return self._data.copy()
+
+    def get_values(self, keys):
+        """
+        Return the values of several keys as a tuple, in the given order,
+        without copying the whole state. keys must be a tuple of 2+ keys.
+        """
+        getter = self._getters.get(keys)
+        if getter is None:
+            getter = self._getters[keys] = itemgetter(*keys)
+        return getter(self._data)
 
     def get(self, key):
-        with self._lock:
-            return self._data.get(key)
+        return self._data.get(key)
 
     def __getitem__(self, key):
         """Allow dictionary-style access, e.g. state['KEY']"""
-        with self._lock:
-            return self._data[key]
+        return self._data[key]
 # New methods for transition handling
 
     def set_transition(self, in_transition: bool):
         """Set the transition flag"""
-        with self._lock:
-            self._data["IN_TRANSITION"] = in_transition
+        self.update(IN_TRANSITION=in_transition)
+        if in_transition:
+            self._settled.clear()
+        else:
+            self._settled.set()
 
     def is_in_transition(self) -> bool:
         """Check if system is in transition"""
-        with self._lock:
-            return self._data.get("IN_TRANSITION", False)
+        return self._data.get("IN_TRANSITION", False)
 
     def wait_for_transition(self, timeout: float = 2.0) -> bool:
         """
         Wait for transition to complete.
         Returns True if transition completed, False if timeout.
         """
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if not self.is_in_transition():
-                return True
-            time.sleep(0.05)
-        return False
+        return self._settled.wait(timeout)
@@ -3,5 +3,5 @@ import time
 
 pam = PAMController()
 while True:
-    print(pam.cmd("RC:910"))
+    print(pam.cmd("RC:910").decode(errors="ignore"))
     time.sleep(1)
@@ -3,6 +3,11 @@ import serial
 import time
 import threading
 
+# Print at most one I/O error per port this often (seconds), count the rest
+ERROR_LOG_INTERVAL = 1.0
+# Open retries back off from open_retry_delay, doubling up to this (seconds)
+OPEN_RETRY_MAX_DELAY = 30.0
+
 
 class SerialReconnect:
     def __init__(self, port, baudrate, timeout=0.15, write_timeout=0.15,
@@ -14,13 +19,21 @@ class SerialReconnect:
         self.open_retry_delay = open_retry_delay
         self.name = name
         self.ser = None
-        self._lock = threading.Lock()
+        # Command/reply exchanges are serialized by the owners of the port
+        # (PAMController._io_lock, the DWIN writer thread), a lock around
+        # single calls here would not keep an exchange together; only
+        # reopening is locked, so two threads erroring at once don't open
+        # the port twice
+        self._reopen_lock = threading.Lock()
+        self._last_err_log = 0.0
+        self._suppressed_errs = 0
         self._open()
         self._last_activity = time.time()
 
     def _open(self):
-        """Open the serial port, retry forever."""
+        """Open the serial port, retry forever with exponential backoff."""
         attempts = 0
+        delay = self.open_retry_delay
         while True:
             try:
                 self.ser = serial.Serial(
@@ -34,89 +47,113 @@ class SerialReconnect:
                 return
             except Exception as e:
                 attempts += 1
-                if attempts % 10 == 0:  # Only print every 10 attempts
-                    print(f"⏳ {self.name} not ready ({e}), waiting...")
-                time.sleep(self.open_retry_delay)
+                if attempts == 1 or attempts % 10 == 0:  # first, then every 10
+                    print(f"⏳ {self.name} not ready ({e}), retrying in {delay:g}s...")
+                time.sleep(delay)
+                delay = min(delay * 2, OPEN_RETRY_MAX_DELAY)
+
+    def _log_error(self, op, e):
+        """Print an I/O error, rate-limited so a dead port doesn't flood the console."""
+        now = time.monotonic()
+        if now - self._last_err_log < ERROR_LOG_INTERVAL:
+            self._suppressed_errs += 1
+            return
+        more = f" (+{self._suppressed_errs} suppressed)" if self._suppressed_errs else ""
+        print(f"❌ {self.name} {op} error: {e}{more}")
+        self._last_err_log = now
+        self._suppressed_errs = 0
 
     def is_connected(self):
         """Check if port is likely connected."""
         try:
-            with self._lock:
-                return self.ser is not None and self.ser.is_open
+            return self.ser is not None and self.ser.is_open
         except:
             return False
 
-    def _reopen(self):
-        """Close and reopen the port."""
-        with self._lock:
-            try:
-                if self.ser:
-                    self.ser.close()
-            except:
-                pass
+    def _reopen(self, failed=None):
+        """Close and reopen the port, unless `failed` was already replaced."""
+        with self._reopen_lock:
+            if failed is not None and self.ser is not failed:
+                return  # another thread reopened it meanwhile
+            self.close()
             self._open()
 
     def write(self, data):
         """Write bytes; reopen on failure."""
+        ser = self.ser
         try:
-            with self._lock:
-                self.ser.write(data)
+            ser.write(data)
         except Exception as e:
-            print(f"❌ {self.name} write error: {e}")
-            self._reopen()
+            self._log_error("write", e)
+            self._reopen(ser)
             # After reopen, try once more (could loop, but simple)
-            with self._lock:
-                self.ser.write(data)
+            self.ser.write(data)
 
     def read(self, size=1):
         """Read up to size bytes; reopen on failure."""
+        ser = self.ser
         try:
-            with self._lock:
-                return self.ser.read(size)
+            return ser.read(size)
         except Exception as e:
-            print(f"❌ {self.name} read error: {e}")
-            self._reopen()
-            with self._lock:
-                return self.ser.read(size)
+            self._log_error("read", e)
+            self._reopen(ser)
+            return self.ser.read(size)
+
+    def read_until(self, expected=b"\n", size=None):
+        """Read until expected is seen, size is reached or timeout; reopen on failure."""
+        ser = self.ser
+        try:
+            return ser.read_until(expected, size)
+        except Exception as e:
+            self._log_error("read_until", e)
+            self._reopen(ser)
+            return self.ser.read_until(expected, size)
 
     def read_all(self):
-        """Read all available bytes; reopen on failure."""
+        """Read the bytes already buffered, b"" if none (never blocks); reopen on failure."""
+        ser = self.ser
         try:
-            with self._lock:
-                return self.ser.read(self.ser.in_waiting or 1)
+            n = ser.in_waiting
+            return ser.read(n) if n else b""
         except Exception as e:
-            print(f"❌ {self.name} read_all error: {e}")
-            self._reopen()
-            with self._lock:
-                return self.ser.read(self.ser.in_waiting or 1)
+            self._log_error("read_all", e)
+            self._reopen(ser)
+            ser = self.ser
+            n = ser.in_waiting
+            return ser.read(n) if n else b""
 
     def reset_input_buffer(self):
         """Clear input buffer; reopen on failure."""
+        ser = self.ser
         try:
-            with self._lock:
-                self.ser.reset_input_buffer()
+            ser.reset_input_buffer()
         except Exception as e:
-            print(f"❌ {self.name} reset_input_buffer error: {e}")
-            self._reopen()
-            with self._lock:
-                self.ser.reset_input_buffer()
+            self._log_error("reset_input_buffer", e)
+            self._reopen(ser)
+            self.ser.reset_input_buffer()
 
     def flush(self):
         """Flush output buffer; reopen on failure."""
+        ser = self.ser
         try:
-            with self._lock:
-                self.ser.flush()
+            ser.flush()
         except Exception as e:
-            print(f"❌ {self.name} flush error: {e}")
-            self._reopen()
-            with self._lock:
-                self.ser.flush()
+            self._log_error("flush", e)
+            self._reopen(ser)
+            self.ser.flush()
+
+    def close(self):
+        """Close the port; errors are ignored."""
+        try:
+            if self.ser:
+                self.ser.close()
+        except Exception:
+            pass
 
     @property
     def in_waiting(self):
         """Return bytes in input buffer; reopen on failure."""
         try:
-            with self._lock:
-                return self.ser.in_waiting
+            return self.ser.in_waiting
         except Exception:
             return 0